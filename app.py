@@ -1,17 +1,22 @@
 import os
 import re
+import asyncio
 import json
 import sqlite3
 import secrets
 import string
 import logging
-from datetime import datetime, timedelta, timezone
+import threading
+import time
+from functools import lru_cache
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, Tuple, List
 from zoneinfo import ZoneInfo  # fuso horário local
 
 import httpx
-from fastapi import FastAPI, Request, Header
-from fastapi.responses import HTMLResponse, RedirectResponse
+import orjson
+from fastapi import FastAPI, Request, Header, BackgroundTasks
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse
 
 # Google APIs
 from google.oauth2 import service_account
@@ -29,7 +34,7 @@ logger = logging.getLogger(__name__)
 # ===========================
 # FastAPI
 # ===========================
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # ===========================
 # ENVs
@@ -58,6 +63,9 @@ SHEET_FIRST_COL  = os.getenv("SHEET_FIRST_COL", "B")
 SHEET_LAST_COL   = os.getenv("SHEET_LAST_COL", "I")
 SHEET_START_ROW  = int(os.getenv("SHEET_START_ROW", "8"))
 SHARE_LINK_ROLE  = os.getenv("SHARE_LINK_ROLE", "writer")
+# 429/5xx do Google: o client refaz com backoff exponencial (só em chamadas idempotentes)
+GOOGLE_API_RETRIES = int(os.getenv("GOOGLE_API_RETRIES", "3"))
+GOOGLE_MAX_CONCURRENCY = int(os.getenv("GOOGLE_MAX_CONCURRENCY", "20"))  # tarefas de fundo simultâneas
 
 SCOPES_SA = [
     "https://www.googleapis.com/auth/drive",
@@ -66,6 +74,7 @@ SCOPES_SA = [
 
 LICENSE_SHEET_ID  = os.getenv("LICENSE_SHEET_ID")
 LICENSE_SHEET_TAB = os.getenv("LICENSE_SHEET_TAB", "Licencas")
+LICENSE_CACHE_TTL = int(os.getenv("LICENSE_CACHE_TTL", "15"))  # segundos; curto para revogação valer logo
 
 # 🌎 Fuso horário local
 APP_TZ = os.getenv("APP_TZ", "America/Sao_Paulo")
@@ -120,6 +129,12 @@ def licenses_db_init():
         temp_license TEXT,
         created_at TEXT
     )""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS pending_group (
+        chat_id TEXT PRIMARY KEY,
+        group_key TEXT,
+        updated_at TEXT
+    )""")
     con.commit()
     con.close()
 
@@ -137,14 +152,6 @@ def _gen_key(prefix="GF"):
 # ===== Pending (licença/email)
 def set_pending(chat_id: str, step: Optional[str], temp_license: Optional[str]):
     con = _db()
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS pending (
-            chat_id TEXT PRIMARY KEY,
-            step TEXT,
-            temp_license TEXT,
-            created_at TEXT
-        )
-    """)
     if step:
         con.execute("""
             INSERT INTO pending(chat_id, step, temp_license, created_at)
@@ -157,14 +164,6 @@ def set_pending(chat_id: str, step: Optional[str], temp_license: Optional[str]):
 
 def get_pending(chat_id: str) -> tuple[Optional[str], Optional[str]]:
     con = _db()
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS pending (
-            chat_id TEXT PRIMARY KEY,
-            step TEXT,
-            temp_license TEXT,
-            created_at TEXT
-        )
-    """)
     cur = con.execute("SELECT step, temp_license FROM pending WHERE chat_id=?", (str(chat_id),))
     row = cur.fetchone()
     con.close()
@@ -175,30 +174,37 @@ def get_pending(chat_id: str) -> tuple[Optional[str], Optional[str]]:
 # ===========================
 # Telegram helpers
 # ===========================
+# Cliente HTTP único (keep-alive) para não refazer TCP+TLS a cada mensagem
+TELEGRAM_API = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+_tg_client = httpx.AsyncClient(
+    base_url=TELEGRAM_API,
+    timeout=12,
+    http2=True,  # várias mensagens multiplexadas na mesma conexão
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+)
+
+# corpo serializado com orjson (mais rápido que o json= padrão do httpx)
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+async def _tg_post(method: str, payload: dict):
+    return await _tg_client.post(method, content=orjson.dumps(payload), headers=_JSON_HEADERS)
+
 async def tg_send(chat_id, text):
-    async with httpx.AsyncClient(timeout=12) as client:
-        try:
-            await client.post(
-                f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
-                json={"chat_id": chat_id, "text": text, "parse_mode": "Markdown"},
-            )
-        except Exception as e:
-            logger.error(f"Erro ao enviar msg: {e}")
+    try:
+        await _tg_post("/sendMessage", {"chat_id": chat_id, "text": text, "parse_mode": "Markdown"})
+    except Exception as e:
+        logger.error(f"Erro ao enviar msg: {e}")
 
 async def tg_send_with_kb(chat_id, text, keyboard):
-    async with httpx.AsyncClient(timeout=12) as client:
-        try:
-            await client.post(
-                f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage",
-                json={
-                    "chat_id": chat_id,
-                    "text": text,
-                    "parse_mode": "Markdown",
-                    "reply_markup": {"inline_keyboard": keyboard},
-                },
-            )
-        except Exception as e:
-            logger.error(f"Erro ao enviar msg com teclado: {e}")
+    try:
+        await _tg_post("/sendMessage", {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown",
+            "reply_markup": {"inline_keyboard": keyboard},
+        })
+    except Exception as e:
+        logger.error(f"Erro ao enviar msg com teclado: {e}")
 
 # ===========================
 # Botões de grupo (inline keyboard)
@@ -215,11 +221,10 @@ GROUP_CHOICES = [
     ("💲Saque/Resgate", "SAQUE_RESGATE"),
 ]
 
+GROUP_LABEL_BY_KEY = {key: lbl for lbl, key in GROUP_CHOICES}
+
 def _group_label_by_key(k: str) -> str:
-    for lbl, key in GROUP_CHOICES:
-        if key == k:
-            return lbl
-    return "💸Gastos Variáveis"
+    return GROUP_LABEL_BY_KEY.get(k, "💸Gastos Variáveis")
 
 def _group_keyboard_rows():
     rows = []
@@ -232,6 +237,9 @@ def _group_keyboard_rows():
         rows.append(row)
     return rows
 
+# teclado é fixo: montado uma vez e reaproveitado em todo envio
+GROUP_KEYBOARD = _group_keyboard_rows()
+
 GROUP_EXAMPLE = {
     "GASTOS_VARIAVEIS": "Mercado, 59,90 no débito hoje",
     "GASTOS_FIXOS": "Aluguel, 2800 via Pix hoje",
@@ -247,19 +255,7 @@ GROUP_EXAMPLE = {
 # ===========================
 # Estado "grupo selecionado"
 # ===========================
-def _ensure_group_state_table():
-    con = _db()
-    con.execute("""
-        CREATE TABLE IF NOT EXISTS pending_group (
-            chat_id TEXT PRIMARY KEY,
-            group_key TEXT,
-            updated_at TEXT
-        )
-    """)
-    con.commit(); con.close()
-
 def set_selected_group(chat_id: str, group_key: Optional[str]):
-    _ensure_group_state_table()
     con = _db()
     if group_key is None:
         con.execute("DELETE FROM pending_group WHERE chat_id=?", (str(chat_id),))
@@ -272,7 +268,6 @@ def set_selected_group(chat_id: str, group_key: Optional[str]):
     con.commit(); con.close()
 
 def get_selected_group(chat_id: str) -> Optional[str]:
-    _ensure_group_state_table()
     con = _db()
     cur = con.execute("SELECT group_key FROM pending_group WHERE chat_id=?", (str(chat_id),))
     row = cur.fetchone()
@@ -282,6 +277,18 @@ def get_selected_group(chat_id: str) -> Optional[str]:
 # ===========================
 # Parsing helpers
 # ===========================
+# Regex compilados uma vez só (antes eram montados/consultados a cada mensagem)
+DATE_RE = re.compile(r"\b(\d{1,2})[\/\-.](\d{1,2})(?:[\/\-.](\d{2,4}))?\b")
+MONEY_RE = re.compile(r"\b\d{1,3}(?:[.\s]\d{3})*(?:,\d{1,2})\b|\b\d+(?:[.,]\d{1,2})\b|\b\d+\b")
+CARD_RE = re.compile(r"cart[aã]o\s+([a-z0-9 ]+)")
+PIX_BANK_RE = re.compile(r"pix\s+([a-z0-9][a-z0-9\s]{0,30})")
+DEBITO_BANK_RE = re.compile(r"debito\s+([a-z0-9][a-z0-9\s]{0,30})")
+DEBITO_ACC_BANK_RE = re.compile(r"d[eé]bito\s+([a-z0-9][a-z0-9\s]{0,30})")
+A_VISTA_RE = re.compile(r"\b(?:[aà]\s+|a)vista\b")
+INSTALLMENTS_RE = re.compile(r"(?:parcelad[oa]\s*(?:em)?\s*|em\s*)?(\d{1,2})\s*x\b")
+INCOME_RE = re.compile(r"\b(recebi|ganhei)\b")
+EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
 def _titlecase(s: str) -> str:
     return " ".join(w.capitalize() for w in s.split())
 
@@ -297,46 +304,44 @@ def _clean_trailing_tokens(s: str) -> str:
         tokens.pop()
     return " ".join(tokens).strip()
 
-def _format_date_br(d: datetime.date) -> str:
-    return d.strftime("%d/%m/%Y")
+def _format_date_br(d: date) -> str:
+    # f-string direta: strftime reinterpreta o formato a cada chamada
+    return f"{d.day:02d}/{d.month:02d}/{d.year}"
 
-def parse_date(text: str) -> Optional[str]:
-    t = text.lower()
-    today = _local_today()
+# Os helpers abaixo recebem `t` já em minúsculas: parse_natural faz o lower() uma vez só.
+def parse_date(t: str, today: Optional[date] = None) -> Optional[str]:
+    today = today or _local_today()
     if "hoje" in t:
         return _format_date_br(today)
     if "ontem" in t:
         return _format_date_br(today - timedelta(days=1))
-    m = re.search(r"\b(\d{1,2})[\/\-.](\d{1,2})(?:[\/\-.](\d{2,4}))?\b", t)
+    m = DATE_RE.search(t)
     if m:
         d = int(m.group(1)); mo = int(m.group(2))
         y = int(m.group(3)) if m.group(3) else today.year
         if y < 100: y += 2000
         try:
-            return _format_date_br(datetime(y, mo, d).date())
+            return _format_date_br(date(y, mo, d))
         except:
             return None
     return None
 
-def parse_money(text: str) -> Optional[float]:
-    t = text.lower().replace("r$", " ").replace("reais", " ")
-    t = re.sub(r"\b\d{1,2}[\/\-.]\d{1,2}(?:[\/\-.]\d{2,4})?\b", " ", t)
-    matches = re.findall(
-        r"\b\d{1,3}(?:[.\s]\d{3})*(?:,\d{1,2})\b|\b\d+(?:[.,]\d{1,2})\b|\b\d+\b",
-        t
-    )
+@lru_cache(maxsize=1024)
+def parse_money(t: str) -> Optional[float]:
+    t = t.replace("r$", " ").replace("reais", " ")
+    t = DATE_RE.sub(" ", t)
+    matches = MONEY_RE.findall(t)
     if not matches:
         return None
     raw = matches[-1].replace(" ", "")
-    if "," in raw and "." in raw:
+    # o último separador decide: vírgula por último = decimal BR ("1.234,56" / "45,90")
+    if raw.rfind(",") > raw.rfind("."):
         raw = raw.replace(".", "").replace(",", ".")
-    else:
-        raw = raw.replace(",", ".")
     try:
         return float(raw)
     except:
         return None
-def detect_payment(text: str) -> str:
+def detect_payment(t: str) -> str:
     """
     Forma de pagamento com padronização:
       - Pix [+ Banco]  => "Pix" ou "Pix Bradesco"
@@ -347,13 +352,11 @@ def detect_payment(text: str) -> str:
       • Sem espaços extras no início/fim
       • Banco capturado logo após 'pix'/'débito' (via pix BRADESCO / no debito sicredi)
     """
-    t = text.lower()
 
     # --- Cartão (mantém lógica original) ---
-    m_card = re.search(r"cart[aã]o\s+([a-z0-9 ]+)", t)
+    m_card = CARD_RE.search(t)
     if m_card:
-        brand = re.sub(r"\s+", " ", m_card.group(1)).strip()
-        brand = _clean_trailing_tokens(brand)
+        brand = _clean_trailing_tokens(m_card.group(1))
         if brand:
             return f"💳cartão {_titlecase(brand)}"
         return "💳cartão"
@@ -362,14 +365,13 @@ def detect_payment(text: str) -> str:
     if "pix" in t:
         # captura um possível banco logo após a palavra 'pix'
         # exemplos válidos: "via pix bradesco", "pix itau", "pix sicredi hoje"
-        m_pix_bank = re.search(r"pix\s+([a-z0-9][a-z0-9\s]{0,30})", t)
+        m_pix_bank = PIX_BANK_RE.search(t)
         bank = ""
         if m_pix_bank:
-            candidate = re.sub(r"\s+", " ", m_pix_bank.group(1)).strip()
-            # remove caudas como 'hoje/ontem/via/no/na/em/de/da' etc.
-            candidate = _clean_trailing_tokens(candidate)
+            # remove caudas como 'hoje/ontem/via/no/na/em/de/da' etc. (já normaliza espaços)
+            candidate = _clean_trailing_tokens(m_pix_bank.group(1))
             # se ainda sobrou algo e não começa com dígito, assume banco
-            if candidate and not re.match(r"^\d", candidate):
+            if candidate and not candidate[0].isdigit():
                 # limita para até duas palavras (ex.: 'banco inter' -> 'Banco Inter')
                 parts = candidate.split()
                 bank = " ".join(parts[:2])
@@ -378,13 +380,11 @@ def detect_payment(text: str) -> str:
     # --- Débito (com/sem banco) ---
     if ("débito" in t) or ("debito" in t):
         # variações: "no debito sicredi", "no débito itau", "debito bradesco"
-        m_deb_bank = re.search(r"debito\s+([a-z0-9][a-z0-9\s]{0,30})", t) or \
-                     re.search(r"d[eé]bito\s+([a-z0-9][a-z0-9\s]{0,30})", t)
+        m_deb_bank = DEBITO_BANK_RE.search(t) or DEBITO_ACC_BANK_RE.search(t)
         bank = ""
         if m_deb_bank:
-            candidate = re.sub(r"\s+", " ", m_deb_bank.group(1)).strip()
-            candidate = _clean_trailing_tokens(candidate)
-            if candidate and not re.match(r"^\d", candidate):
+            candidate = _clean_trailing_tokens(m_deb_bank.group(1))
+            if candidate and not candidate[0].isdigit():
                 parts = candidate.split()
                 bank = " ".join(parts[:2])
         return ("Débito " + _titlecase(bank)).strip()
@@ -393,7 +393,7 @@ def detect_payment(text: str) -> str:
     return "Outros"
 
 
-def detect_installments(text: str, forma_pagamento: Optional[str] = None) -> str:
+def detect_installments(t: str, forma_pagamento: Optional[str] = None) -> str:
     """
     Condição de pagamento:
       - Para Pix/Débito => sempre 'à vista'
@@ -407,14 +407,12 @@ def detect_installments(text: str, forma_pagamento: Optional[str] = None) -> str
         if fp.startswith("Pix") or fp.startswith("Débito"):
             return "à vista"
 
-    t = text.lower()
-
     # à vista explícito (qualquer variação)
-    if re.search(r"\b(a\s+vista|à\s+vista|avista)\b", t):
+    if A_VISTA_RE.search(t):
         return "à vista"
 
     # procura quantidade de parcelas (1–2 dígitos) seguido de 'x'
-    m = re.search(r"(?:parcelad[oa]\s*(?:em)?\s*|em\s*)?(\d{1,2})\s*x\b", t)
+    m = INSTALLMENTS_RE.search(t)
     if m:
         n = int(m.group(1))
         return f"{n}x"
@@ -429,7 +427,7 @@ def _category_before_comma(text: str) -> Optional[str]:
     cat = parts[0].strip()
     if not cat:
         return None
-    cat = re.sub(r"\s+", " ", cat)
+    cat = " ".join(cat.split())
     if cat.lower() in {"iptu", "ipva"}:
         return cat.upper()
     return _titlecase(cat)
@@ -452,78 +450,100 @@ GROUP_EMOJI = {
 # ===========================
 # NLP (modo texto livre)
 # ===========================
-def detect_group_and_category_free(text: str) -> Tuple[str, str]:
-    t = text.lower()
+def _keywords_re(words) -> re.Pattern:
+    # uma única varredura do texto em vez de um `in` por palavra-chave
+    return re.compile("|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)))
+
+SAQUE_KW_RE = _keywords_re(["saquei", "saque ", "resgatei", "resgate "])
+VARIAVEIS_KW_RE = _keywords_re(["restaurante", "lanche", "pizza", "hamburg", "sushi", "rappi", "uber", "99"])
+
+# palavra-chave → (grupo, categoria); a primeira que aparecer no texto vence
+KEYWORD_CATEGORIES = tuple(
+    [(a, GROUP_EMOJI["ASSINATURA"], _titlecase(a)) for a in
+     ["netflix", "amazon", "prime video", "disney", "disney+", "globoplay", "spotify", "hbo", "max", "apple tv", "youtube premium"]]
+    + [
+        ("aluguel",    GROUP_EMOJI["GASTOS_FIXOS"], "Aluguel"),
+        ("água",       GROUP_EMOJI["GASTOS_FIXOS"], "Agua"),
+        ("agua",       GROUP_EMOJI["GASTOS_FIXOS"], "Agua"),
+        ("energia",    GROUP_EMOJI["GASTOS_FIXOS"], "Energia"),
+        ("luz",        GROUP_EMOJI["GASTOS_FIXOS"], "Energia"),
+        ("internet",   GROUP_EMOJI["GASTOS_FIXOS"], "Internet"),
+        ("condomínio", GROUP_EMOJI["GASTOS_FIXOS"], "Condomínio"),
+        ("condominio", GROUP_EMOJI["GASTOS_FIXOS"], "Condomínio"),
+        ("ifood",      GROUP_EMOJI["GASTOS_VARIAVEIS"], "ifood"),
+        ("mercado",    GROUP_EMOJI["GASTOS_VARIAVEIS"], "mercado"),
+    ]
+)
+
+@lru_cache(maxsize=4096)  # mensagens se repetem muito (mesmos gastos/lojas)
+def detect_group_and_category_free(t: str) -> Tuple[str, str]:
 
     # Saque / Resgate
-    if any(w in t for w in ["saquei", "saque ", "resgatei", "resgate "]):
-        cat = _category_before_comma(text) or "Saque/Resgate"
+    if SAQUE_KW_RE.search(t):
+        cat = _category_before_comma(t) or "Saque/Resgate"
         return GROUP_EMOJI["SAQUE_RESGATE"], cat
 
     # Reserva
     if "reservei" in t or "reserva" in t:
-        cat = _category_before_comma(text) or "Reserva"
+        cat = _category_before_comma(t) or "Reserva"
         return GROUP_EMOJI["RESERVA"], cat
 
     # Investimento
     if ("investi" in t) or ("investimento" in t):
-        cat = _category_before_comma(text)
+        cat = _category_before_comma(t)
         if not cat:
             if "renda fixa" in t: cat = "Renda Fixa"
-            elif "aç" in t or "aco" in t or "ações" in t or "acoes" in t: cat = "Ações"
+            elif "aç" in t or "aco" in t: cat = "Ações"
             else: cat = "Investimento"
         return GROUP_EMOJI["INVESTIMENTO"], cat
 
     # Pagamento de Fatura (keywords explícitas)
     if ("pagamento de fatura" in t) or ("paguei a fatura" in t):
-        cat = _category_before_comma(text)
+        cat = _category_before_comma(t)
         if not cat:
-            m = re.search(r"cart[aã]o\s+([a-z0-9 ]+)", t)
+            m = CARD_RE.search(t)
             cat = f"Cartão {_titlecase(m.group(1))}" if m and m.group(1) else "Cartão"
         return GROUP_EMOJI["PAG_FATURA"], cat
 
     # Ganhos
     if "vendas" in t: return GROUP_EMOJI["GANHOS"], "Vendas"
     if "salário" in t or "salario" in t: return GROUP_EMOJI["GANHOS"], "Salário"
-    if re.search(r"\b(recebi|ganhei)\b", t): return GROUP_EMOJI["GANHOS"], "Ganhos"
-
-    # Assinaturas
-    assin = ["netflix", "amazon", "prime video", "disney", "disney+", "globoplay", "spotify", "hbo", "max", "apple tv", "youtube premium"]
-    for a in assin:
-        if a in t:
-            return GROUP_EMOJI["ASSINATURA"], _titlecase(a.replace("+", "+"))
+    if INCOME_RE.search(t): return GROUP_EMOJI["GANHOS"], "Ganhos"
 
-    # Fixos
-    if "aluguel" in t:  return GROUP_EMOJI["GASTOS_FIXOS"], "Aluguel"
-    if "água" in t or "agua" in t: return GROUP_EMOJI["GASTOS_FIXOS"], "Agua"
-    if "energia" in t or "luz" in t: return GROUP_EMOJI["GASTOS_FIXOS"], "Energia"
-    if "internet" in t: return GROUP_EMOJI["GASTOS_FIXOS"], "Internet"
-    if "condomínio" in t or "condominio" in t: return GROUP_EMOJI["GASTOS_FIXOS"], "Condomínio"
+    # Assinaturas / Fixos / Variáveis por palavra-chave (tabela plana, em ordem de prioridade)
+    for kw, group_label, cat in KEYWORD_CATEGORIES:
+        if kw in t:
+            return group_label, cat
 
     # Variáveis
-    if "ifood" in t: return GROUP_EMOJI["GASTOS_VARIAVEIS"], "ifood"
-    if "mercado" in t: return GROUP_EMOJI["GASTOS_VARIAVEIS"], "mercado"
-    if any(w in t for w in ["restaurante","lanche","pizza","hamburg","sushi","rappi","uber","99"]):
-        return GROUP_EMOJI["GASTOS_VARIAVEIS"], _category_before_comma(text) or "Outros"
+    if VARIAVEIS_KW_RE.search(t):
+        return GROUP_EMOJI["GASTOS_VARIAVEIS"], _category_before_comma(t) or "Outros"
 
-    return GROUP_EMOJI["GASTOS_VARIAVEIS"], _category_before_comma(text) or "Outros"
+    return GROUP_EMOJI["GASTOS_VARIAVEIS"], _category_before_comma(t) or "Outros"
+
+NO_VALUE_MSG = "Não achei o valor. Ex.: 45,90"
 
 def parse_natural(text: str) -> Tuple[Optional[List], Optional[str]]:
-    valor = parse_money(text)
+    # sem nenhum dígito não há valor: evita rodar todos os regex à toa ("ok", "obrigado")
+    if not any(ch.isdigit() for ch in text):
+        return None, NO_VALUE_MSG
+
+    t = text.lower()
+    valor = parse_money(t)
     if valor is None:
-        return None, "Não achei o valor. Ex.: 45,90"
+        return None, NO_VALUE_MSG
 
-    data_br = parse_date(text) or _local_today().strftime("%d/%m/%Y")
-    forma = detect_payment(text)
-    cond = detect_installments(text, forma_pagamento=forma)
+    today = _local_today()  # uma consulta de relógio/fuso por mensagem
+    data_br = parse_date(t, today) or _format_date_br(today)
+    forma = detect_payment(t)
+    cond = detect_installments(t, forma_pagamento=forma)
 
-    group_label, category = detect_group_and_category_free(text)
+    group_label, category = detect_group_and_category_free(t)
 
     # Pagamento de fatura → forma nunca é "💳cartão ..."
     if group_label == GROUP_EMOJI["PAG_FATURA"] and str(forma).startswith("💳cartão"):
-        t_low = text.lower()
-        if "pix" in t_low: forma = "Pix"
-        elif ("débito" in t_low) or ("debito" in t_low): forma = "débito"
+        if "pix" in t: forma = "Pix"
+        elif ("débito" in t) or ("debito" in t): forma = "débito"
         else: forma = "Outros"
 
     # Tipo por grupo
@@ -609,10 +629,22 @@ def _sa_services():
     sheets = build("sheets", "v4", credentials=creds)
     return drive, sheets
 
+# build() é caro (carrega o discovery doc e monta o cliente); guardamos os
+# serviços por thread, pois o httplib2 por baixo não é thread-safe.
+_google_local = threading.local()
+_google_generation = 0
+
+def _invalidate_google_services():
+    global _google_generation
+    _google_generation += 1
+
 def google_services():
-    if GOOGLE_USE_OAUTH:
-        return _oauth_services()
-    return _sa_services()
+    cached = getattr(_google_local, "services", None)
+    if cached and cached[0] == _google_generation:
+        return cached[1]
+    services = _oauth_services() if GOOGLE_USE_OAUTH else _sa_services()
+    _google_local.services = (_google_generation, services)
+    return services
 
 # ===========================
 # Google Drive/Sheets helpers
@@ -620,11 +652,11 @@ def google_services():
 def drive_find_in_folder(service, folder_id: str, name: str) -> Optional[str]:
     safe_name = name.replace("'", "\\'")
     q = f"name = '{safe_name}' and '{folder_id}' in parents and trashed = false"
-    res = service.files().list(q=q, spaces="drive", fields="files(id,name)", pageSize=1).execute()
+    res = service.files().list(q=q, spaces="drive", fields="files(id,name)", pageSize=1).execute(num_retries=GOOGLE_API_RETRIES)
     files = res.get("files", [])
     return files[0]["id"] if files else None
 
-def drive_copy_template(new_name: str) -> str:
+def drive_copy_template(new_name: str) -> Tuple[str, Optional[str]]:
     if not GS_TEMPLATE_ID or not GS_DEST_FOLDER_ID:
         raise RuntimeError("GS_TEMPLATE_ID e GS_DEST_FOLDER_ID devem estar configurados.")
     drive, _ = google_services()
@@ -633,33 +665,46 @@ def drive_copy_template(new_name: str) -> str:
         "parents": [GS_DEST_FOLDER_ID],
         "mimeType": "application/vnd.google-apps.spreadsheet",
     }
-    file = drive.files().copy(fileId=GS_TEMPLATE_ID, body=body, fields="id").execute()
-    return file["id"]
+    # já pede o link na própria cópia: economiza um files().get depois
+    file = drive.files().copy(fileId=GS_TEMPLATE_ID, body=body, fields="id,webViewLink").execute()
+    return file["id"], file.get("webViewLink")
 
-def drive_share_with_email(file_id: str, email: str, role: str = "writer") -> str:
+def drive_share_with_email(file_id: str, email: str, role: str = "writer", link: Optional[str] = None) -> str:
     drive, _ = google_services()
     try:
         drive.permissions().create(
             fileId=file_id,
             body={"type": "user", "role": role, "emailAddress": email},
             fields="id"
-        ).execute()
+        ).execute(num_retries=GOOGLE_API_RETRIES)
     except HttpError as e:
         if 'already has permission' not in str(e) and 'Domain policy' not in str(e):
             logger.error(f"Erro ao compartilhar {file_id} com {email}: {e}")
             raise
-    meta = drive.files().get(fileId=file_id, fields="webViewLink").execute()
+    if link:
+        return link
+    meta = drive.files().get(fileId=file_id, fields="webViewLink").execute(num_retries=GOOGLE_API_RETRIES)
     return meta.get("webViewLink")
 
 def drive_copy_and_link(email: str) -> Tuple[str, str]:
     new_name = f"Lancamentos - {email}"
-    file_id = drive_copy_template(new_name)
-    link = drive_share_with_email(file_id, email, SHARE_LINK_ROLE)
+    file_id, web_link = drive_copy_template(new_name)
+    link = drive_share_with_email(file_id, email, SHARE_LINK_ROLE, link=web_link)
     return file_id, link
 
+def _a1_sheet(sheet_name: str) -> str:
+    # nome de aba entre aspas simples (aceita espaço/emoji/aspas) — notação A1
+    return "'" + sheet_name.replace("'", "''") + "'"
+
+def _append_range(sheet_name: str) -> str:
+    return f"{_a1_sheet(sheet_name)}!{SHEET_FIRST_COL}{SHEET_START_ROW}:{SHEET_LAST_COL}"
+
+# aba/colunas vêm do ambiente: o range padrão é montado uma vez só
+DEFAULT_APPEND_RANGE = _append_range(WORKSHEET_NAME)
+
 def sheets_append_row(spreadsheet_id: str, sheet_name: str, values: List):
     _, sheets = google_services()
-    rng = f"{sheet_name}!{SHEET_FIRST_COL}{SHEET_START_ROW}:{SHEET_LAST_COL}"
+    rng = DEFAULT_APPEND_RANGE if sheet_name == WORKSHEET_NAME else _append_range(sheet_name)
     body = {"values": [values]}
     sheets.spreadsheets().values().append(
         spreadsheetId=spreadsheets_id if False else spreadsheet_id,  # não alterar
@@ -672,21 +717,43 @@ def sheets_append_row(spreadsheet_id: str, sheet_name: str, values: List):
 # ===========================
 # Licenças em Google Sheets
 # ===========================
-def _sheet_get_headers_and_rows():
+# Leitura da aba de licenças em cache (TTL): antes cada mensagem relia a aba inteira
+# só para validar a licença. Escritas invalidam; quem precisa do nº da linha lê fresco.
+_license_sheet_cache = {"data": None, "exp": 0.0}
+_license_sheet_lock = threading.Lock()  # workers do to_thread: uma leitura da aba por vez
+
+def _invalidate_license_sheet_cache():
+    with _license_sheet_lock:
+        _license_sheet_cache["exp"] = 0.0
+
+def _sheet_license_index(fresh: bool = False):
+    """(mapa de cabeçalho, {LICENÇA: (nº da linha, linha)}), montado uma vez por leitura da aba."""
     if not LICENSE_SHEET_ID:
         raise RuntimeError("LICENSE_SHEET_ID não configurado.")
-    _, sheets = google_services()
-    rng = f"{LICENSE_SHEET_TAB}!A:Z"
-    resp = sheets.spreadsheets().values().get(
-        spreadsheetId=LICENSE_SHEET_ID, range=rng, majorDimension="ROWS"
-    ).execute()
-    values = resp.get("values", [])
-    if not values:
-        raise RuntimeError("A aba de licenças está vazia (sem cabeçalho).")
-    headers = [h.strip() for h in values[0]]
-    rows = values[1:]
-    return headers, rows
-
+    with _license_sheet_lock:
+        # quem esperou o lock reaproveita a leitura que outro worker acabou de fazer
+        now = time.monotonic()
+        if not fresh and _license_sheet_cache["data"] is not None and now < _license_sheet_cache["exp"]:
+            return _license_sheet_cache["data"]
+        _, sheets = google_services()
+        rng = f"{_a1_sheet(LICENSE_SHEET_TAB)}!A:Z"
+        resp = sheets.spreadsheets().values().get(
+            spreadsheetId=LICENSE_SHEET_ID, range=rng, majorDimension="ROWS", fields="values"
+        ).execute(num_retries=GOOGLE_API_RETRIES)
+        values = resp.get("values", [])
+        if not values:
+            raise RuntimeError("A aba de licenças está vazia (sem cabeçalho).")
+        headers = [h.strip() for h in values[0]]
+        idx = _sheet_header_index_map(headers)
+        col = idx["licenca"]
+        by_key = {}
+        for i, r in enumerate(values[1:], start=2):
+            key = (r[col] if col < len(r) else "").strip().upper()
+            by_key.setdefault(key, (i, r))  # chave repetida: vale a primeira linha, como na busca linear
+        _license_sheet_cache.update(data=(idx, by_key), exp=now + LICENSE_CACHE_TTL)
+        return idx, by_key
+
+@lru_cache(maxsize=256)  # poucos cabeçalhos distintos, normalizados a cada consulta de licença
 def _norm(s: str) -> str:
     import unicodedata as _ud
     s = _ud.normalize("NFD", s or "")
@@ -702,13 +769,9 @@ def _sheet_header_index_map(headers):
     return idx
 
 def _sheet_find_row_idx_by_license(license_key: str) -> Optional[int]:
-    headers, rows = _sheet_get_headers_and_rows()
-    idx = _sheet_header_index_map(headers)
-    col = idx["licenca"]
-    for i, r in enumerate(rows, start=2):
-        if col < len(r) and (r[col] or "").strip().upper() == license_key.strip().upper():
-            return i
-    return None
+    _, by_key = _sheet_license_index()
+    hit = by_key.get(license_key.strip().upper())
+    return hit[0] if hit else None
 
 def _col_letter(col_zero_based: int) -> str:
     col = col_zero_based + 1
@@ -721,15 +784,16 @@ def _col_letter(col_zero_based: int) -> str:
 def sheet_update_license_email(license_key: str, email: str):
     if not LICENSE_SHEET_ID:
         return
-    row = _sheet_find_row_idx_by_license(license_key)
-    if not row:
+    # uma leitura só da aba (antes eram duas: achar a linha e depois o cabeçalho);
+    # fresca, para não gravar na linha errada se a aba mudou
+    idx, by_key = _sheet_license_index(fresh=True)
+    hit = by_key.get(license_key.strip().upper())
+    if not hit:
         raise RuntimeError(f"Licença '{license_key}' não encontrada na planilha de licenças.")
 
-    headers, _ = _sheet_get_headers_and_rows()
-    idx = _sheet_header_index_map(headers)
     col_email = idx["email"]
     col_letter = _col_letter(col_email)
-    rng = f"{LICENSE_SHEET_TAB}!{col_letter}{row}"
+    rng = f"{_a1_sheet(LICENSE_SHEET_TAB)}!{col_letter}{hit[0]}"
 
     _, sheets = google_services()
     sheets.spreadsheets().values().update(
@@ -737,35 +801,35 @@ def sheet_update_license_email(license_key: str, email: str):
         range=rng,
         valueInputOption="USER_ENTERED",
         body={"values": [[email]]}
-    ).execute()
+    ).execute(num_retries=GOOGLE_API_RETRIES)
+    _invalidate_license_sheet_cache()
 
 def sheet_get_license(license_key: str) -> Optional[dict]:
-    headers, rows = _sheet_get_headers_and_rows()
-    idx = _sheet_header_index_map(headers)
-    for r in rows:
-        key = (r[idx["licenca"]] if idx["licenca"] < len(r) else "").strip().upper()
-        if key == license_key.strip().upper():
-            status = (r[idx["status"]] if idx["status"] < len(r) else "").strip().lower() or "active"
-            end    = (r[idx["data final"]] if idx["data final"] < len(r) else "").strip()
-            expires_at = None
-            if end:
-                expires_at = f"{end}T23:59:59+00:00"
-            return {
-                "license_key": license_key,
-                "status": status,
-                "max_files": 1,
-                "expires_at": expires_at,
-                "notes": None,
-            }
-    return None
+    idx, by_key = _sheet_license_index()
+    hit = by_key.get(license_key.strip().upper())
+    if not hit:
+        return None
+    r = hit[1]
+    status = (r[idx["status"]] if idx["status"] < len(r) else "").strip().lower() or "active"
+    end    = (r[idx["data final"]] if idx["data final"] < len(r) else "").strip()
+    expires_at = None
+    if end:
+        expires_at = f"{end}T23:59:59+00:00"
+    return {
+        "license_key": license_key,
+        "status": status,
+        "max_files": 1,
+        "expires_at": expires_at,
+        "notes": None,
+    }
 
 def sheet_append_license(license_key: str, days: Optional[int], email: Optional[str] = None):
     start_date = datetime.now(timezone.utc).date()
-    start_iso = start_date.strftime("%Y-%m-%d")
-    end_iso   = (start_date + timedelta(days=days)).strftime("%Y-%m-%d") if days else ""
+    start_iso = start_date.isoformat()
+    end_iso   = (start_date + timedelta(days=days)).isoformat() if days else ""
     _, sheets = google_services()
     values = [[license_key, "" if (days is None or days == 0) else str(days), start_iso, end_iso, email or "", "active"]]
-    rng = f"{LICENSE_SHEET_TAB}!A:F"
+    rng = f"{_a1_sheet(LICENSE_SHEET_TAB)}!A:F"
     sheets.spreadsheets().values().append(
         spreadsheetId=LICENSE_SHEET_ID,
         range=rng,
@@ -773,6 +837,7 @@ def sheet_append_license(license_key: str, days: Optional[int], email: Optional[
         insertDataOption="INSERT_ROWS",
         body={"values": values},
     ).execute()
+    _invalidate_license_sheet_cache()
 
 # ===========================
 # Licenças (camada de negócio)
@@ -780,13 +845,13 @@ def sheet_append_license(license_key: str, days: Optional[int], email: Optional[
 def create_license(days: Optional[int] = 30, max_files: int = 1, notes: Optional[str] = None, custom_key: Optional[str] = None):
     key = custom_key or _gen_key()
     if LICENSE_SHEET_ID:
-        if _sheet_find_row_idx_by_license(key):
-            while _sheet_find_row_idx_by_license(key):
-                key = _gen_key()
+        _invalidate_license_sheet_cache()  # checagem de unicidade com a aba atual
+        while _sheet_find_row_idx_by_license(key):
+            key = _gen_key()
         sheet_append_license(key, None if days == 0 else days, email=None)
         exp = None
         if days and days > 0:
-            exp = (datetime.now(timezone.utc) + timedelta(days=days)).date().strftime("%Y-%m-%d")
+            exp = (datetime.now(timezone.utc) + timedelta(days=days)).date().isoformat()
         return key, exp
     # fallback SQLite
     expires_at = (datetime.now(timezone.utc) + timedelta(days=days)).isoformat(timespec="seconds") if days else None
@@ -886,26 +951,30 @@ def _ensure_unique_or_reuse(email: str) -> Optional[str]:
     name = f"Lancamentos - {email}"
     return drive_find_in_folder(drive, GS_DEST_FOLDER_ID, name)
 
+# limita quantas tarefas de fundo falam com o Google ao mesmo tempo
+_google_sem = asyncio.Semaphore(GOOGLE_MAX_CONCURRENCY)
+
 async def setup_client_file(chat_id: str, email: str) -> Tuple[bool, Optional[str], Optional[str]]:
     cli = get_client(chat_id)
     if cli and cli.get("item_id"):
         try:
-            link = drive_share_with_email(cli["item_id"], email, SHARE_LINK_ROLE)
+            link = await asyncio.to_thread(drive_share_with_email, cli["item_id"], email, SHARE_LINK_ROLE)
         except Exception:
             link = None
         return True, None, link
 
     try:
-        exist_id = _ensure_unique_or_reuse(email)
+        # chamadas ao Drive são bloqueantes (cópia do modelo leva segundos): rodam fora do event loop
+        exist_id = await asyncio.to_thread(_ensure_unique_or_reuse, email)
         if exist_id:
             set_client_file(str(chat_id), exist_id)
             try:
-                link = drive_share_with_email(exist_id, email, SHARE_LINK_ROLE)
+                link = await asyncio.to_thread(drive_share_with_email, exist_id, email, SHARE_LINK_ROLE)
             except Exception:
                 link = None
             return True, None, link
 
-        new_id, web_link = drive_copy_and_link(email)
+        new_id, web_link = await asyncio.to_thread(drive_copy_and_link, email)
         set_client_file(str(chat_id), new_id)
         return True, None, web_link
 
@@ -916,6 +985,22 @@ async def setup_client_file(chat_id: str, email: str) -> Tuple[bool, Optional[st
         logger.error(f"Exceção ao criar planilha: {e}")
         return False, f"Falha ao criar planilha: {e}", None
 
+async def provision_client(chat_id, email: str):
+    # roda depois do 200 ao Telegram: a cópia do modelo no Drive pode levar vários segundos
+    async with _google_sem:
+        okf, errf, link = await setup_client_file(str(chat_id), email)
+    if not okf:
+        logger.error(f"ERRO CRÍTICO NO SETUP DO ARQUIVO: {errf}")
+        await tg_send(chat_id, f"❌ Falha na configuração: {errf}. Verifique os logs do servidor.")
+        return
+
+    await tg_send(chat_id, f"🚀 Planilha configurada com sucesso!\n🔗 {link}")
+    await tg_send(chat_id,
+        "Agora você pode:\n"
+        "• Digitar seus lançamentos normalmente (ex.: `Mercado, 59 no débito hoje`)\n"
+        "• Ou usar */novo* para escolher o grupo antes de lançar."
+    )
+
 def add_row_to_client(values: List, chat_id: str):
     if len(values) != 8:
         raise RuntimeError(f"Esperava 8 colunas, recebi {len(values)}.")
@@ -924,6 +1009,18 @@ def add_row_to_client(values: List, chat_id: str):
         raise RuntimeError("Planilha do cliente não configurada.")
     sheets_append_row(cli["item_id"], WORKSHEET_NAME, values)
 
+async def launch_row(chat_id, row: List):
+    try:
+        async with _google_sem:
+            await asyncio.to_thread(add_row_to_client, row, str(chat_id))
+    except Exception as e:
+        logger.error(f"Erro ao lançar na planilha: {e}")
+        await tg_send(chat_id, f"❌ Erro ao lançar na planilha: {e}")
+        return
+
+    # confirmação e teclado do próximo lançamento num único sendMessage
+    await tg_send_with_kb(chat_id, "✅ Lançado!\n\n➕ *Novo lançamento?* Escolha o grupo:", GROUP_KEYBOARD)
+
 # ===========================
 # Rotas
 # ===========================
@@ -933,6 +1030,10 @@ def _startup():
     print(f"✅ DB pronto em {SQLITE_PATH}")
     print(f"Auth mode: {'OAuth' if GOOGLE_USE_OAUTH else 'Service Account'}")
 
+@app.on_event("shutdown")
+async def _shutdown():
+    await _tg_client.aclose()
+
 @app.get("/")
 def root():
     return {"status": "ok", "auth_mode": "oauth" if GOOGLE_USE_OAUTH else "sa"}
@@ -966,12 +1067,14 @@ def oauth_callback(code: str | None = None, state: str | None = None):
     if not creds.refresh_token:
         return HTMLResponse("<h3>Não veio refresh_token. Refazer /oauth/start.</h3>", status_code=400)
     _save_credentials(creds)
+    _invalidate_google_services()
     return HTMLResponse("<h3>✅ OAuth ok! Pode voltar ao Telegram.</h3>")
 
 # ---- Telegram webhook ----
 @app.post("/telegram/webhook")
 async def telegram_webhook(
     req: Request,
+    background_tasks: BackgroundTasks,
     x_telegram_bot_api_secret_token: Optional[str] = Header(default=None)
 ):
     # Verifica segredo de webhook (se configurado)
@@ -979,7 +1082,7 @@ async def telegram_webhook(
         if (x_telegram_bot_api_secret_token or "") != TELEGRAM_WEBHOOK_SECRET:
             return {"ok": True}
 
-    body = await req.json()
+    body = orjson.loads(await req.body())
 
     # ===== CallbackQuery (clique nos botões) =====
     callback = body.get("callback_query")
@@ -990,11 +1093,7 @@ async def telegram_webhook(
 
         # confirma ao Telegram (remove "loading...")
         try:
-            async with httpx.AsyncClient(timeout=12) as client:
-                await client.post(
-                    f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/answerCallbackQuery",
-                    json={"callback_query_id": cb_id}
-                )
+            await _tg_post("/answerCallbackQuery", {"callback_query_id": cb_id})
         except Exception:
             pass
 
@@ -1009,6 +1108,7 @@ async def telegram_webhook(
         return {"ok": True}
 
     # ===== Mensagem normal =====
+    # Consultas à aba de licenças (Sheets) são bloqueantes: vão para asyncio.to_thread
     message = body.get("message") or {}
     chat_id = message.get("chat", {}).get("id")
     text = (message.get("text") or "").strip()
@@ -1031,7 +1131,7 @@ async def telegram_webhook(
                     days = int(parts[2])
             except Exception:
                 pass
-            key, exp = create_license(days=None if days == 0 else days, custom_key=custom_key)
+            key, exp = await asyncio.to_thread(create_license, None if days == 0 else days, custom_key=custom_key)
             msg = f"🔑 *Licença criada:*\n`{key}`\n*Validade:* {'vitalícia' if not exp else exp}"
             await tg_send(chat_id, msg)
             return {"ok": True}
@@ -1053,8 +1153,7 @@ async def telegram_webhook(
 
     # /novo -> teclado de grupos
     if text.lower() in ("/novo", "/lancar", "/lançar"):
-        kb = _group_keyboard_rows()
-        await tg_send_with_kb(chat_id, "O que você quer lançar? Escolha o *grupo* abaixo:", kb)
+        await tg_send_with_kb(chat_id, "O que você quer lançar? Escolha o *grupo* abaixo:", GROUP_KEYBOARD)
         return {"ok": True}
 
     # /start amigável
@@ -1080,7 +1179,12 @@ async def telegram_webhook(
             await tg_send(chat_id, "Envie `/start SEU-CÓDIGO` (ex.: `/start GF-ABCD-1234`).")
             return {"ok": True}
 
-        lic = get_license(token)
+        # e-mail inválido não precisa de consulta à aba de licenças
+        if email and not EMAIL_RE.match(email):
+            await tg_send(chat_id, "❗ E-mail inválido. Envie `/start SEU-CÓDIGO seu@email.com` ou só `/start SEU-CÓDIGO`.")
+            return {"ok": True}
+
+        lic = await asyncio.to_thread(get_license, token)
         ok, err = is_license_valid(lic)
         if not ok:
             await tg_send(chat_id, f"❌ Licença inválida: {err}")
@@ -1099,24 +1203,12 @@ async def telegram_webhook(
         set_client_email(chat_id_str, email)
         try:
             if LICENSE_SHEET_ID:
-                sheet_update_license_email(token, email)
+                await asyncio.to_thread(sheet_update_license_email, token, email)
         except Exception as e:
             logger.error(f"Falha ao atualizar e-mail da licença no Sheets: {e}")
 
         await tg_send(chat_id, "✅ Obrigado! Configurando sua planilha de lançamentos...")
-
-        okf, errf, link = await setup_client_file(chat_id_str, email)
-        if not okf:
-            logger.error(f"ERRO CRÍTICO NO SETUP DO ARQUIVO: {errf}")
-            await tg_send(chat_id, f"❌ Falha na configuração: {errf}. Verifique os logs do servidor.")
-            return {"ok": True}
-
-        await tg_send(chat_id, f"🚀 Planilha configurada com sucesso!\n🔗 {link}")
-        await tg_send(chat_id,
-            "Agora você pode:\n"
-            "• Digitar seus lançamentos normalmente (ex.: `Mercado, 59 no débito hoje`)\n"
-            "• Ou usar */novo* para escolher o grupo antes de lançar."
-        )
+        background_tasks.add_task(provision_client, chat_id, email)
         return {"ok": True}
 
     # ===== Conversa pendente (licença/e-mail)
@@ -1124,7 +1216,7 @@ async def telegram_webhook(
 
     if step == "await_license":
         token = text.strip()
-        lic = get_license(token)
+        lic = await asyncio.to_thread(get_license, token)
         ok, err = is_license_valid(lic)
         if not ok:
             await tg_send(chat_id, f"❌ Licença inválida: {err}\nTente novamente ou digite /cancel.")
@@ -1141,36 +1233,24 @@ async def telegram_webhook(
 
     if step == "await_email":
         email = text.strip()
-        if not re.match(r"[^@]+@[^@]+\.[^@]+", email):
+        if not EMAIL_RE.match(email):
             await tg_send(chat_id, "❗ E-mail inválido. Tente novamente (ex.: `cliente@gmail.com`).")
             return {"ok": True}
 
         set_client_email(chat_id_str, email)
         try:
             if LICENSE_SHEET_ID and temp_license:
-                sheet_update_license_email(temp_license, email)
+                await asyncio.to_thread(sheet_update_license_email, temp_license, email)
         except Exception as e:
             logger.error(f"Falha ao atualizar e-mail da licença no Sheets: {e}")
 
         set_pending(chat_id_str, None, None)
         await tg_send(chat_id, "✅ Obrigado! Configurando sua planilha de lançamentos...")
-
-        okf, errf, link = await setup_client_file(chat_id_str, email)
-        if not okf:
-            logger.error(f"ERRO CRÍTICO NO SETUP DO ARQUIVO: {errf}")
-            await tg_send(chat_id, f"❌ Falha na configuração: {errf}. Verifique os logs do servidor.")
-            return {"ok": True}
-
-        await tg_send(chat_id, f"🚀 Planilha configurada com sucesso!\n🔗 {link}")
-        await tg_send(chat_id,
-            "Agora você pode:\n"
-            "• Digitar seus lançamentos normalmente (ex.: `Mercado, 59 no débito hoje`)\n"
-            "• Ou usar */novo* para escolher o grupo antes de lançar."
-        )
+        background_tasks.add_task(provision_client, chat_id, email)
         return {"ok": True}
 
     # Exige licença (antes de lançar)
-    ok, msg = require_active_license(chat_id_str)
+    ok, msg = await asyncio.to_thread(require_active_license, chat_id_str)
     if not ok:
         await tg_send(chat_id, f"❗ {msg}")
         return {"ok": True}
@@ -1212,14 +1292,6 @@ async def telegram_webhook(
             else:
                 row[6] = "Outros"
 
-    # Lança na planilha
-    try:
-        add_row_to_client(row, chat_id_str)
-        await tg_send(chat_id, "✅ Lançado!")
-        kb = _group_keyboard_rows()
-        await tg_send_with_kb(chat_id, "➕ *Novo lançamento?* Escolha o grupo:", kb)
-    except Exception as e:
-        logger.error(f"Erro ao lançar na planilha: {e}")
-        await tg_send(chat_id, f"❌ Erro ao lançar na planilha: {e}")
-
+    # Lança na planilha fora do caminho da requisição (Telegram recebe o 200 na hora)
+    background_tasks.add_task(launch_row, chat_id, row)
     return {"ok": True}